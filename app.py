@@ -3,6 +3,8 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import streamlit as st
 import tempfile
+import io
+import hashlib
 from pathlib import Path
 import traceback
 from pdf_processor import PDFProcessor
@@ -47,118 +49,120 @@ def main():
         if st.button("Convert to Word", type="primary"):
             convert_pdf_to_word(uploaded_file, force_ocr, preserve_formatting)
 
-def convert_pdf_to_word(uploaded_file, force_ocr, preserve_formatting):
-    """Convert PDF to Word document"""
-    
+# Cached on the PDF's SHA-256 digest and the options so Streamlit reruns with the
+# same file skip the pipeline; the leading underscore keeps _pdf_bytes out of the key.
+# Bounded in size and age since each entry holds the full text and .docx bytes
+# and the server is shared between sessions
+@st.cache_data(show_spinner=False, max_entries=16, ttl=3600)
+def run_conversion(pdf_digest, force_ocr, preserve_formatting, _pdf_bytes):
+    """Run the conversion pipeline and return (extracted_content, docx_bytes, used_ocr)"""
     # Create temporary directory for processing
     with tempfile.TemporaryDirectory() as temp_dir:
+        # Save uploaded file
+        pdf_path = os.path.join(temp_dir, "input.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(_pdf_bytes)
+        
+        # Initialize processors
+        pdf_processor = PDFProcessor()
+        ocr_processor = OCRProcessor()
+        word_generator = WordGenerator()
+        
         try:
-            # Save uploaded file
-            pdf_path = os.path.join(temp_dir, "input.pdf")
-            with open(pdf_path, "wb") as f:
-                f.write(uploaded_file.getvalue())
-            
-            # Initialize processors
-            pdf_processor = PDFProcessor()
-            ocr_processor = OCRProcessor()
-            word_generator = WordGenerator()
-            
-            # Progress tracking
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            # Step 1: Analyze PDF
-            status_text.text("Analyzing PDF structure...")
-            progress_bar.progress(10)
-            
-            # Check if PDF has extractable text
+            # Check if PDF has extractable text; the open document and the
+            # pages read here are reused by the extraction below
             has_text = pdf_processor.has_extractable_text(pdf_path)
+            used_ocr = force_ocr or not has_text
             
-            if has_text and not force_ocr:
-                st.info("📝 Document contains extractable text. Using direct text extraction.")
-                
-                # Step 2: Extract text directly
-                status_text.text("Extracting text from PDF...")
-                progress_bar.progress(30)
-                
+            if not used_ocr:
+                # Extract text directly
                 extracted_content = pdf_processor.extract_text_with_formatting(pdf_path)
-                progress_bar.progress(60)
-                
             else:
-                if force_ocr:
-                    st.info("🔍 OCR processing requested. Converting PDF to images...")
-                else:
-                    st.info("🔍 No extractable text found. Using OCR processing...")
-                
-                # Step 2: Convert PDF to images
-                status_text.text("Converting PDF pages to images...")
-                progress_bar.progress(20)
-                
-                images = pdf_processor.convert_to_images(pdf_path)
-                progress_bar.progress(40)
-                
-                # Step 3: OCR processing
-                status_text.text("Performing OCR on images...")
-                progress_bar.progress(50)
-                
-                extracted_content = ocr_processor.process_images(images)
-                progress_bar.progress(80)
-            
-            # Step 4: Generate Word document
-            status_text.text("Generating Word document...")
-            progress_bar.progress(90)
-            
-            word_path = os.path.join(temp_dir, "output.docx")
-            word_generator.create_document(extracted_content, word_path, preserve_formatting)
-            
-            progress_bar.progress(100)
-            status_text.text("Conversion completed successfully!")
-            
-            # Step 5: Provide download
-            st.success("✅ Conversion completed successfully!")
-            
-            # Display preview
-            st.header("Preview")
-            preview_text = extracted_content[:1000] + "..." if len(extracted_content) > 1000 else extracted_content
-            st.text_area("Document Preview", preview_text, height=200)
-            
-            # Download button
-            with open(word_path, "rb") as f:
-                word_content = f.read()
-            
-            # Generate download filename
-            original_name = Path(uploaded_file.name).stem
-            download_name = f"{original_name}_converted.docx"
-            
-            st.download_button(
-                label="📥 Download Word Document",
-                data=word_content,
-                file_name=download_name,
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                # Convert PDF to images and run OCR; pages are rendered as OCR consumes them
+                images = pdf_processor.convert_to_images(pdf_path, has_text=has_text)
+                extracted_content = ocr_processor.process_images(
+                    images, page_count=pdf_processor.get_page_count(pdf_path)
+                )
+        finally:
+            pdf_processor.close()
+        
+        # Build the document in memory; it goes straight to the download button
+        word_buffer = io.BytesIO()
+        word_generator.create_document(extracted_content, word_buffer, preserve_formatting)
+        
+        return extracted_content, word_buffer.getvalue(), used_ocr
+
+def convert_pdf_to_word(uploaded_file, force_ocr, preserve_formatting):
+    """Convert PDF to Word document"""
+    try:
+        pdf_bytes = uploaded_file.getvalue()
+        
+        # Progress tracking
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        
+        status_text.text("Converting PDF to Word...")
+        progress_bar.progress(10)
+        
+        # run_conversion hides Streamlit's cache spinner, so show our own
+        # while the pipeline runs
+        with st.spinner("Processing PDF... OCR on scanned documents can take a while."):
+            extracted_content, word_content, used_ocr = run_conversion(
+                hashlib.sha256(pdf_bytes).hexdigest(), force_ocr, preserve_formatting, pdf_bytes
             )
+        
+        progress_bar.progress(100)
+        status_text.text("Conversion completed successfully!")
+        
+        if not used_ocr:
+            st.info("📝 Document contains extractable text. Used direct text extraction.")
+        elif force_ocr:
+            st.info("🔍 OCR processing requested. Converted PDF pages to images for OCR.")
+        else:
+            st.info("🔍 No extractable text found. Used OCR processing.")
+        
+        # Provide download
+        st.success("✅ Conversion completed successfully!")
+        
+        # Display preview
+        st.header("Preview")
+        preview_text = extracted_content[:1000] + "..." if len(extracted_content) > 1000 else extracted_content
+        st.text_area("Document Preview", preview_text, height=200)
+        
+        # Generate download filename
+        original_name = Path(uploaded_file.name).stem
+        download_name = f"{original_name}_converted.docx"
+        
+        # Download button
+        st.download_button(
+            label="📥 Download Word Document",
+            data=word_content,
+            file_name=download_name,
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+        
+        # Show statistics
+        st.header("Conversion Statistics")
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Characters", len(extracted_content))
+        
+        with col2:
+            words = len(extracted_content.split())
+            st.metric("Words", words)
+        
+        with col3:
+            lines = len(extracted_content.split('\n'))
+            st.metric("Lines", lines)
             
-            # Show statistics
-            st.header("Conversion Statistics")
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("Characters", len(extracted_content))
-            
-            with col2:
-                words = len(extracted_content.split())
-                st.metric("Words", words)
-            
-            with col3:
-                lines = len(extracted_content.split('\n'))
-                st.metric("Lines", lines)
-                
-        except Exception as e:
-            st.error(f"❌ Error during conversion: {str(e)}")
-            st.error("Please check your PDF file and try again.")
-            
-            # Show detailed error in expander for debugging
-            with st.expander("Show detailed error"):
-                st.code(traceback.format_exc())
+    except Exception as e:
+        st.error(f"❌ Error during conversion: {str(e)}")
+        st.error("Please check your PDF file and try again.")
+        
+        # Show detailed error in expander for debugging
+        with st.expander("Show detailed error"):
+            st.code(traceback.format_exc())
 
 if __name__ == "__main__":
     # Set page config
@@ -194,7 +198,7 @@ if __name__ == "__main__":
         st.header("About")
         st.markdown("""
         This application uses:
-        - **PyPDF2** for text extraction
+        - **pypdfium2** for text extraction
         - **Tesseract OCR** for handwritten text
         - **python-docx** for Word generation
         - **Pillow** for image processing
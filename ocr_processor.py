@@ -1,39 +1,74 @@
+import os
 import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image
 import numpy as np
 import cv2
 import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# One OpenMP thread per Tesseract run; pages are parallelized across processes
+# instead. pytesseract launches tesseract as a subprocess, which inherits this.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# cv2.ximgproc (Sauvola thresholding) is only in opencv-contrib-python
+HAS_XIMGPROC = hasattr(cv2, 'ximgproc')
+
+
+def _worker_count():
+    """Number of CPUs this process may run on (respects affinity/container limits)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_ocr_worker():
+    """Keep OpenCV single-threaded inside each OCR worker process"""
+    cv2.setNumThreads(1)
+
 
 class OCRProcessor:
+    SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+    
     def __init__(self):
         # Configure Tesseract for better accuracy
         self.config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz!@#$%^&*()_+-=[]{}|;:,.<>?/~` '
         
+    def _to_gray(self, image):
+        """Return image as a grayscale numpy array, converting only color input"""
+        gray = np.asarray(image)
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(gray, cv2.COLOR_RGB2GRAY)
+        return gray
+    
     def preprocess_image(self, image):
         """Preprocess image for better OCR results"""
         try:
-            # Convert PIL Image to OpenCV format
-            opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
+            # Pages are rendered in grayscale already
+            gray = self._to_gray(image)
             
             # Apply Gaussian blur to reduce noise
             blurred = cv2.GaussianBlur(gray, (5, 5), 0)
             
-            # Apply adaptive thresholding
-            thresh = cv2.adaptiveThreshold(
-                blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-            
-            # Apply morphological operations to clean up the image
-            kernel = np.ones((2, 2), np.uint8)
-            cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            
-            # Convert back to PIL Image
-            processed_image = Image.fromarray(cleaned)
+            if HAS_XIMGPROC:
+                # Sauvola thresholding cleans up in a single pass
+                thresh = cv2.ximgproc.niBlackThreshold(
+                    blurred, 255, cv2.THRESH_BINARY, 25, 0.2,
+                    binarizationMethod=cv2.ximgproc.BINARIZATION_SAUVOLA
+                )
+            else:
+                # Apply adaptive thresholding
+                thresh = cv2.adaptiveThreshold(
+                    blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+                )
+                
+                # Apply morphological operations to clean up the image (in place)
+                kernel = np.ones((2, 2), np.uint8)
+                cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, dst=thresh)
             
-            return processed_image
+            # Stay in numpy; Tesseract takes the array as-is
+            return thresh
             
         except Exception as e:
             print(f"Error preprocessing image: {e}")
@@ -42,93 +77,131 @@ class OCRProcessor:
     def enhance_image(self, image):
         """Enhance image quality for OCR"""
         try:
-            # Enhance contrast
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(1.5)
+            image = np.asarray(image)
             
-            # Enhance sharpness
-            enhancer = ImageEnhance.Sharpness(image)
-            image = enhancer.enhance(1.2)
+            # Enhance contrast
+            enhanced = cv2.convertScaleAbs(image, alpha=1.5, beta=0)
             
-            # Apply unsharp mask filter
-            image = image.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
+            # Sharpen in one convolution (replaces sharpness + unsharp mask)
+            enhanced = cv2.filter2D(enhanced, -1, self.SHARPEN_KERNEL)
             
-            return image
+            return enhanced
             
         except Exception as e:
             print(f"Error enhancing image: {e}")
             return image
     
+    def _text_from_data(self, data):
+        """Rebuild page text from image_to_data output, keeping recognized words only"""
+        lines = []
+        current_key = None
+        current_block = None
+        words = []
+        
+        for i, word in enumerate(data['text']):
+            if float(data['conf'][i]) <= 0 or not word.strip():
+                continue
+            
+            block = (data['block_num'][i], data['par_num'][i])
+            key = block + (data['line_num'][i],)
+            
+            if key != current_key:
+                if words:
+                    lines.append(' '.join(words))
+                    words = []
+                # Blank line between Tesseract paragraphs
+                if current_block is not None and block != current_block:
+                    lines.append('')
+                current_key = key
+                current_block = block
+            
+            words.append(word)
+        
+        if words:
+            lines.append(' '.join(words))
+        
+        return '\n'.join(lines)
+    
+    def _run_tesseract(self, image, config):
+        """Single Tesseract pass; low-confidence tokens are dropped from the text"""
+        data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+        return self._text_from_data(data)
+    
     def extract_text_from_image(self, image):
         """Extract text from a single image using OCR"""
         try:
-            # Preprocess the image
-            processed_image = self.preprocess_image(image)
-            
-            # Enhance the image
-            enhanced_image = self.enhance_image(processed_image)
-            
-            # Perform OCR with different PSM modes for better results
-            psm_modes = [6, 3, 4, 7, 8, 11, 12, 13]
-            best_text = ""
-            best_confidence = 0
-            
-            for psm in psm_modes:
-                try:
-                    config = f'--oem 3 --psm {psm}'
-                    
-                    # Extract text
-                    text = pytesseract.image_to_string(enhanced_image, config=config)
-                    
-                    # Get confidence scores
-                    data = pytesseract.image_to_data(enhanced_image, config=config, output_type=pytesseract.Output.DICT)
-                    confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                    
-                    if confidences:
-                        avg_confidence = sum(confidences) / len(confidences)
-                        
-                        # Use the result with highest confidence
-                        if avg_confidence > best_confidence and len(text.strip()) > 0:
-                            best_confidence = avg_confidence
-                            best_text = text
+            if self.detect_handwriting(image):
+                # Preprocess the image
+                processed_image = self.preprocess_image(image)
                 
-                except Exception as e:
-                    continue
+                # Enhance the image
+                enhanced_image = self.enhance_image(processed_image)
+                
+                text = self._run_tesseract(enhanced_image, '--oem 3 --psm 6')
+            else:
+                text = ""
             
-            # If no good result found, try with original image
-            if not best_text.strip():
-                best_text = pytesseract.image_to_string(image, config='--oem 3 --psm 6')
+            # Clean rendered pages (or a failed handwriting pass) go in as rendered;
+            # Tesseract's internal Sauvola binarization does better on them
+            if not text.strip():
+                text = self._run_tesseract(image, '--oem 3 --psm 6 -c thresholding_method=2')
             
-            return best_text.strip()
+            return text.strip()
             
         except Exception as e:
             print(f"Error extracting text from image: {e}")
             return ""
     
-    def process_images(self, image_data):
-        """Process multiple images and combine extracted text"""
+    def _extract_text_from_payload(self, payload):
+        """Rebuild a page image sent to a worker process and OCR it"""
+        mode, size, data = payload
+        return self.extract_text_from_image(Image.frombytes(mode, size, data))
+    
+    def _append_page_text(self, text_parts, page_num, page_text):
+        """Append one page's OCR result to the combined text"""
+        # Add page separator
+        if page_num > 1:
+            text_parts.append(f"\n\n--- Page {page_num} ---\n\n")
+        
+        if page_text:
+            text_parts.append(page_text)
+        else:
+            text_parts.append(f"[No text detected on page {page_num}]")
+        
+        text_parts.append("\n")
+    
+    def process_images(self, image_data, page_count=None):
+        """Process multiple images (any iterable, consumed lazily) and combine extracted text"""
         try:
-            combined_text = ""
-            
-            for img_info in image_data:
-                page_num = img_info['page_number']
-                image = img_info['image']
-                
-                # Add page separator
-                if page_num > 1:
-                    combined_text += f"\n\n--- Page {page_num} ---\n\n"
-                
-                # Extract text from current page
-                page_text = self.extract_text_from_image(image)
-                
-                if page_text:
-                    combined_text += page_text
-                else:
-                    combined_text += f"[No text detected on page {page_num}]"
+            text_parts = []
+            # Workers all start on the first submit, so don't start more than there are pages
+            max_workers = _worker_count()
+            if page_count:
+                max_workers = min(max_workers, page_count)
+            in_flight = deque()
+            
+            # OCR pages in parallel, collecting results in page order
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_ocr_worker) as executor:
+                for img_info in image_data:
+                    # Ship raw pixel buffers rather than pickled PIL images, and
+                    # drop the image so only in-flight pages stay in memory
+                    image = img_info.pop('image')
+                    payload = (image.mode, image.size, image.tobytes())
+                    del image
+                    
+                    future = executor.submit(self._extract_text_from_payload, payload)
+                    in_flight.append((img_info['page_number'], future))
+                    
+                    # Keep enough pages queued to keep every worker busy
+                    if len(in_flight) >= 2 * max_workers:
+                        page_num, future = in_flight.popleft()
+                        self._append_page_text(text_parts, page_num, future.result())
                 
-                combined_text += "\n"
+                while in_flight:
+                    page_num, future = in_flight.popleft()
+                    self._append_page_text(text_parts, page_num, future.result())
             
-            return combined_text.strip()
+            return ''.join(text_parts).strip()
             
         except Exception as e:
             raise Exception(f"Error processing images: {e}")
@@ -137,7 +210,7 @@ class OCRProcessor:
         """Detect if image contains handwritten text (basic heuristic)"""
         try:
             # Convert to grayscale
-            gray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2GRAY)
+            gray = self._to_gray(image)
             
             # Apply edge detection
             edges = cv2.Canny(gray, 50, 150)
@@ -145,18 +218,14 @@ class OCRProcessor:
             # Find contours
             contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
-            # Analyze contour characteristics
-            irregular_contours = 0
-            for contour in contours:
-                # Calculate contour area and perimeter
-                area = cv2.contourArea(contour)
-                if area > 100:  # Filter small noise
-                    perimeter = cv2.arcLength(contour, True)
-                    if perimeter > 0:
-                        circularity = 4 * np.pi * area / (perimeter * perimeter)
-                        # Handwritten text tends to have more irregular shapes
-                        if circularity < 0.3:
-                            irregular_contours += 1
+            # Analyze contour characteristics in one vectorized pass
+            count = len(contours)
+            areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float64, count=count)
+            perimeters = np.fromiter((cv2.arcLength(c, True) for c in contours), dtype=np.float64, count=count)
+            circularity = 4 * np.pi * areas / np.where(perimeters > 0, perimeters * perimeters, 1)
+            
+            # Filter small noise; handwritten text tends to have more irregular shapes
+            irregular_contours = int(((areas > 100) & (perimeters > 0) & (circularity < 0.3)).sum())
             
             # If more than 30% of contours are irregular, likely handwritten
             if len(contours) > 0 and irregular_contours / len(contours) > 0.3:
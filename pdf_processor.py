@@ -1,33 +1,131 @@
-import PyPDF2
-from pdf2image import convert_from_path
+import pypdfium2 as pdfium
+import pymupdf
 import os
 import tempfile
+import threading
 from PIL import Image
-import io
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+
+# PDFium is not thread-safe, even across separate documents, and Streamlit runs
+# each session in its own thread; every pdfium call in this process holds this lock
+# (re-entrant so locked methods can call each other)
+_PDFIUM_LOCK = threading.RLock()
+# PyMuPDF doesn't support multi-threaded use either
+_MUPDF_LOCK = threading.Lock()
+
+
+def _worker_count():
+    """Number of CPUs this process may run on (respects affinity/container limits)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _page_text(pdf_document, page_num):
+    """Extract the raw text of a single page"""
+    page = pdf_document[page_num]
+    try:
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+
+
+def _format_page_text(page_text):
+    """Basic formatting preservation: drop blank lines and surrounding whitespace"""
+    formatted_lines = []
+    for line in page_text.splitlines():
+        line = line.strip()
+        if line:
+            formatted_lines.append(line)
+    return '\n'.join(formatted_lines)
+
+
+# Each worker process holds its own document, so workers need no lock
+_worker_document = None
+
+
+def _open_worker_document(pdf_path):
+    global _worker_document
+    _worker_document = pdfium.PdfDocument(pdf_path)
+
+
+def _extract_worker_page(page_num):
+    return _format_page_text(_page_text(_worker_document, page_num))
+
 
 class PDFProcessor:
+    # OCR accuracy on printed text plateaus around 200 dpi
+    OCR_DPI = 200
+    SMALL_PAGE_OCR_DPI = 250
+    SMALL_PAGE_POINTS = 432  # 6 inches on the longer side
+    # Measured with pypdfium2: ~2 ms to extract a text page, ~10 ms to fork a worker
+    # and reopen the PDF. Each worker gets at least one chunk of PARALLEL_CHUNK_PAGES,
+    # and below PARALLEL_MIN_PAGES the serial loop finishes before a pool would start
+    PARALLEL_CHUNK_PAGES = 16
+    PARALLEL_MIN_PAGES = 128
+    
     def __init__(self):
         self.temp_dir = None
+        self.pdf_path = None
+        self.pdf_document = None
+        # Raw text of pages already read, so the probe isn't repeated by extraction
+        self.page_text_cache = {}
+    
+    def _open(self, pdf_path):
+        """Return the document for pdf_path, opening it only once (caller holds _PDFIUM_LOCK)"""
+        if self.pdf_document is None or self.pdf_path != pdf_path:
+            self.close()
+            self.pdf_document = pdfium.PdfDocument(pdf_path)
+            self.pdf_path = pdf_path
+        return self.pdf_document
+    
+    def close(self):
+        """Close the cached PDF document"""
+        if self.pdf_document is not None:
+            with _PDFIUM_LOCK:
+                self.pdf_document.close()
+        self.pdf_document = None
+        self.pdf_path = None
+        self.page_text_cache = {}
+    
+    def _cached_page_text(self, page_num):
+        """Extract the raw text of a page of the open document, caching it (caller holds _PDFIUM_LOCK)"""
+        if page_num not in self.page_text_cache:
+            self.page_text_cache[page_num] = _page_text(self.pdf_document, page_num)
+        return self.page_text_cache[page_num]
+    
+    def get_page_count(self, pdf_path):
+        """Number of pages in the PDF, reusing the open document"""
+        with _PDFIUM_LOCK:
+            return len(self._open(pdf_path))
     
     def has_extractable_text(self, pdf_path):
         """Check if PDF has extractable text content"""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
+            with _PDFIUM_LOCK:
+                pdf_document = self._open(pdf_path)
                 
-                # Check first few pages for text
-                pages_to_check = min(3, len(pdf_reader.pages))
-                total_text = ""
+                # Check first few pages for text, stopping as soon as there is enough
+                pages_to_check = min(3, len(pdf_document))
+                text_parts = []
                 
                 for page_num in range(pages_to_check):
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
-                    total_text += text
+                    text = self._cached_page_text(page_num)
+                    
+                    # Consider it has text if we extract meaningful content
+                    # (more than just whitespace and special characters)
+                    text_parts.append(''.join(c for c in text if c.isalnum() or c.isspace()))
+                    if len(''.join(text_parts).strip()) > 50:
+                        return True
                 
-                # Consider it has text if we extract meaningful content
-                # (more than just whitespace and special characters)
-                clean_text = ''.join(c for c in total_text if c.isalnum() or c.isspace())
-                return len(clean_text.strip()) > 50
+                return False
                 
         except Exception as e:
             print(f"Error checking PDF text: {e}")
@@ -36,61 +134,85 @@ class PDFProcessor:
     def extract_text_with_formatting(self, pdf_path):
         """Extract text from PDF with basic formatting preservation"""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                extracted_text = ""
+            # Held across the pool too, so no worker is forked while another
+            # thread is inside PDFium
+            with _PDFIUM_LOCK:
+                pdf_document = self._open(pdf_path)
+                page_count = len(pdf_document)
                 
-                for page_num, page in enumerate(pdf_reader.pages):
-                    if page_num > 0:
-                        extracted_text += f"\n\n--- Page {page_num + 1} ---\n\n"
-                    
-                    page_text = page.extract_text()
-                    
-                    # Basic formatting preservation
-                    lines = page_text.split('\n')
-                    formatted_lines = []
-                    
-                    for line in lines:
-                        line = line.strip()
-                        if line:
-                            formatted_lines.append(line)
-                    
-                    extracted_text += '\n'.join(formatted_lines)
+                # Pages read by has_extractable_text are reused, not extracted again
+                raw_texts = dict(self.page_text_cache)
+                pending = [page_num for page_num in range(page_count) if page_num not in raw_texts]
+                
+                # Only start as many workers as there are chunks to hand out
+                max_workers = min(_worker_count(), math.ceil(len(pending) / self.PARALLEL_CHUNK_PAGES))
                 
-                return extracted_text
+                if len(pending) < self.PARALLEL_MIN_PAGES or max_workers < 2:
+                    for page_num in pending:
+                        raw_texts[page_num] = _page_text(pdf_document, page_num)
+                    page_texts = [_format_page_text(raw_texts[page_num]) for page_num in range(page_count)]
+                else:
+                    # Extract pages in parallel; map() yields results in page order
+                    with ProcessPoolExecutor(
+                        max_workers=max_workers,
+                        initializer=_open_worker_document,
+                        initargs=(pdf_path,)
+                    ) as executor:
+                        extracted = executor.map(
+                            _extract_worker_page, pending, chunksize=self.PARALLEL_CHUNK_PAGES
+                        )
+                        formatted = dict(zip(pending, extracted))
+                    
+                    page_texts = [
+                        formatted[page_num] if page_num in formatted else _format_page_text(raw_texts[page_num])
+                        for page_num in range(page_count)
+                    ]
+            
+            # Join pages with separators in a single pass
+            extracted_parts = []
+            for page_num, page_text in enumerate(page_texts):
+                if page_num > 0:
+                    extracted_parts.append(f"\n\n--- Page {page_num + 1} ---\n\n")
+                extracted_parts.append(page_text)
+            
+            return ''.join(extracted_parts)
                 
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {e}")
     
-    def convert_to_images(self, pdf_path):
-        """Convert PDF pages to images for OCR processing"""
+    def _ocr_dpi(self, page, has_text):
+        """Pick the rendering DPI for a page, bumping it for very small scanned pages"""
+        # Only scans need the extra resolution; forced OCR of a text PDF stays at OCR_DPI
+        if not has_text and max(page.rect.width, page.rect.height) < self.SMALL_PAGE_POINTS:
+            return self.SMALL_PAGE_OCR_DPI
+        return self.OCR_DPI
+    
+    def convert_to_images(self, pdf_path, dpi=None, has_text=False):
+        """Yield PDF pages one at a time as grayscale images for OCR processing"""
         try:
-            # Convert PDF to images
-            images = convert_from_path(
-                pdf_path,
-                dpi=300,  # High DPI for better OCR results
-                fmt='RGB'
-            )
+            # Render pages in-process with PyMuPDF; OCR only needs gray. The lock is
+            # taken per page, never across a yield, so other sessions can render
+            # while this one runs OCR
+            with _MUPDF_LOCK:
+                pdf_document = pymupdf.open(pdf_path)
+                page_count = pdf_document.page_count
             
-            # Convert PIL Images to bytes for processing
-            image_data = []
-            for i, image in enumerate(images):
-                # Convert to RGB if not already
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                # Save to bytes
-                img_byte_arr = io.BytesIO()
-                image.save(img_byte_arr, format='PNG')
-                img_byte_arr.seek(0)
-                
-                image_data.append({
-                    'page_number': i + 1,
-                    'image': image,
-                    'bytes': img_byte_arr.getvalue()
-                })
-            
-            return image_data
+            try:
+                for i in range(page_count):
+                    with _MUPDF_LOCK:
+                        page = pdf_document[i]
+                        pix = page.get_pixmap(dpi=dpi or self._ocr_dpi(page, has_text), colorspace=pymupdf.csGRAY)
+                        image = Image.frombytes('L', (pix.width, pix.height), pix.samples)
+                        # Free the MuPDF objects while still holding the lock
+                        del page, pix
+                    
+                    yield {
+                        'page_number': i + 1,
+                        'image': image
+                    }
+            finally:
+                with _MUPDF_LOCK:
+                    pdf_document.close()
             
         except Exception as e:
             raise Exception(f"Error converting PDF to images: {e}")
@@ -98,17 +220,25 @@ class PDFProcessor:
     def get_pdf_info(self, pdf_path):
         """Get basic information about the PDF"""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                info = {
-                    'pages': len(pdf_reader.pages),
-                    'title': pdf_reader.metadata.get('/Title', 'Unknown') if pdf_reader.metadata else 'Unknown',
-                    'author': pdf_reader.metadata.get('/Author', 'Unknown') if pdf_reader.metadata else 'Unknown',
-                    'creator': pdf_reader.metadata.get('/Creator', 'Unknown') if pdf_reader.metadata else 'Unknown'
-                }
-                
-                return info
+            with _PDFIUM_LOCK:
+                # Leave the document as we found it: only keep it open if it already was
+                was_open = self.pdf_document is not None and self.pdf_path == pdf_path
+                pdf_document = self._open(pdf_path)
+                try:
+                    metadata = pdf_document.get_metadata_dict()
+                    page_count = len(pdf_document)
+                finally:
+                    if not was_open:
+                        self.close()
+            
+            info = {
+                'pages': page_count,
+                'title': metadata.get('Title') or 'Unknown',
+                'author': metadata.get('Author') or 'Unknown',
+                'creator': metadata.get('Creator') or 'Unknown'
+            }
+            
+            return info
                 
         except Exception as e:
             return {
@@ -3,13 +3,36 @@ from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.shared import OxmlElement, qn
 import re
+from itertools import groupby
 
 class WordGenerator:
+    # Compiled once; these run for every paragraph
+    _PAGE_SPLIT = re.compile(r'--- Page \d+ ---')
+    _HEADING_PATS = tuple(re.compile(p) for p in (
+        r'^[A-Z][A-Z\s]{2,}$',  # ALL CAPS
+        r'^\d+\.\s*[A-Z]',      # Numbered headings
+        r'^[A-Z][^.!?]*$',      # Capitalized without ending punctuation
+        r'^\s*[A-Z][^.!?]{10,50}$'  # Short capitalized text
+    ))
+    _NUMBERED_HEADING = _HEADING_PATS[1]
+    _LIST_PATS = tuple(re.compile(p) for p in (
+        r'^\s*[-•*]\s+',        # Bullet points
+        r'^\s*\d+\.\s+',        # Numbered lists
+        r'^\s*[a-zA-Z]\.\s+',   # Lettered lists
+        r'^\s*\(\d+\)\s+',      # Parenthetical numbers
+    ))
+    # Strips the list markers above, in the same order, in one pass
+    _LIST_STRIP = re.compile(r'^\s*(?:[-•*]\s+)?(?:\d+\.\s+)?(?:[a-zA-Z]\.\s+)?(?:\(\d+\)\s+)?')
+    _SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+    _CAPS_PROBE = re.compile(r'[A-Z][^a-zA-Z.!?]*(?:[A-Z]|[.!?]|$)')
+    # A run of non-empty lines, i.e. one '\n\n'-separated paragraph
+    _PARAGRAPH = re.compile(r'[^\n]+(?:\n[^\n]+)*')
+    
     def __init__(self):
         self.document = None
     
     def create_document(self, text_content, output_path, preserve_formatting=True):
-        """Create a Word document from extracted text"""
+        """Create a Word document from extracted text and save it to a path or file-like object"""
         try:
             # Create a new document
             self.document = Document()
@@ -30,28 +53,31 @@ class WordGenerator:
         except Exception as e:
             raise Exception(f"Error creating Word document: {e}")
     
+    def _iter_sections(self, text_content):
+        """Yield (start, end) offsets of the text between page markers"""
+        start = 0
+        for marker in self._PAGE_SPLIT.finditer(text_content):
+            yield start, marker.start()
+            start = marker.end()
+        yield start, len(text_content)
+    
     def _add_formatted_content(self, text_content):
         """Add content with formatting preservation"""
         try:
-            # Split content into sections/pages
-            sections = re.split(r'--- Page \d+ ---', text_content)
-            
-            for i, section in enumerate(sections):
-                if not section.strip():
-                    continue
-                
-                # Add page break for new pages (except first)
-                if i > 0:
-                    self.document.add_page_break()
+            # Walk sections/pages and their paragraphs in place, without splitting
+            for i, (start, end) in enumerate(self._iter_sections(text_content)):
+                page_started = False
                 
-                # Process paragraphs
-                paragraphs = section.split('\n\n')
-                
-                for para_text in paragraphs:
-                    para_text = para_text.strip()
+                for match in self._PARAGRAPH.finditer(text_content, start, end):
+                    para_text = match.group().strip()
                     if not para_text:
                         continue
                     
+                    # Add page break for new pages (except first)
+                    if i > 0 and not page_started:
+                        self.document.add_page_break()
+                    page_started = True
+                    
                     # Detect different types of content
                     if self._is_heading(para_text):
                         self._add_heading(para_text)
@@ -90,19 +116,20 @@ class WordGenerator:
     
     def _is_heading(self, text):
         """Detect if text is likely a heading"""
-        # Common heading patterns
-        patterns = [
-            r'^[A-Z][A-Z\s]{2,}$',  # ALL CAPS
-            r'^\d+\.\s*[A-Z]',      # Numbered headings
-            r'^[A-Z][^.!?]*$',      # Capitalized without ending punctuation
-            r'^\s*[A-Z][^.!?]{10,50}$'  # Short capitalized text
-        ]
-        
         text = text.strip()
+        if not text:
+            return False
+        
+        # Cheap checks before any regex: only numbered headings start with a digit,
+        # everything else needs a capital first letter and can't end in . ! or ?
+        if text[0].isdigit():
+            return bool(self._NUMBERED_HEADING.match(text))
+        if not text[0].isupper() or text.endswith(('.', '!', '?')):
+            return False
         
-        # Check patterns
-        for pattern in patterns:
-            if re.match(pattern, text):
+        # Check common heading patterns
+        for pattern in self._HEADING_PATS:
+            if pattern.match(text):
                 return True
         
         # Check if it's short and doesn't end with punctuation
@@ -115,15 +142,8 @@ class WordGenerator:
     
     def _is_list_item(self, text):
         """Detect if text is a list item"""
-        patterns = [
-            r'^\s*[-•*]\s+',        # Bullet points
-            r'^\s*\d+\.\s+',        # Numbered lists
-            r'^\s*[a-zA-Z]\.\s+',   # Lettered lists
-            r'^\s*\(\d+\)\s+',      # Parenthetical numbers
-        ]
-        
-        for pattern in patterns:
-            if re.match(pattern, text):
+        for pattern in self._LIST_PATS:
+            if pattern.match(text):
                 return True
         
         return False
@@ -152,10 +172,7 @@ class WordGenerator:
         """Add text as a list item"""
         try:
             # Remove list markers
-            clean_text = re.sub(r'^\s*[-•*]\s+', '', text)
-            clean_text = re.sub(r'^\s*\d+\.\s+', '', clean_text)
-            clean_text = re.sub(r'^\s*[a-zA-Z]\.\s+', '', clean_text)
-            clean_text = re.sub(r'^\s*\(\d+\)\s+', '', clean_text)
+            clean_text = self._LIST_STRIP.sub('', text, count=1)
             
             # Add as bullet point
             self.document.add_paragraph(clean_text, style='List Bullet')
@@ -168,20 +185,24 @@ class WordGenerator:
     def _add_paragraph(self, text):
         """Add regular paragraph"""
         try:
-            # Split long text into sentences for better formatting
-            sentences = re.split(r'(?<=[.!?])\s+', text)
-            
             paragraph = self.document.add_paragraph()
             
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if sentence:
-                    # Add some basic formatting detection
-                    if sentence.isupper():
-                        run = paragraph.add_run(sentence + ' ')
+            # An all-caps sentence needs an uppercase letter whose next letter is
+            # uppercase too, or that ends the sentence; without one, skip the split
+            # but write the same text the split path would
+            if text.isascii() and not self._CAPS_PROBE.search(text):
+                paragraph.add_run(self._SENTENCE_SPLIT.sub(' ', text) + ' ')
+            else:
+                # Split long text into sentences for better formatting
+                sentences = self._SENTENCE_SPLIT.split(text)
+                
+                # Add some basic formatting detection; consecutive sentences with
+                # the same style share one run
+                sentences = (sentence.strip() for sentence in sentences)
+                for is_bold, group in groupby(filter(None, sentences), key=str.isupper):
+                    run = paragraph.add_run(''.join(sentence + ' ' for sentence in group))
+                    if is_bold:
                         run.bold = True
-                    else:
-                        paragraph.add_run(sentence + ' ')
             
             # Set paragraph formatting
             paragraph.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY